@@ -1,5 +1,15 @@
 # -*- coding: utf-8 -*-
-import zlib
+# CRC32: prefer libdeflate (PCLMULQDQ-accelerated, ~10x faster than stock zlib),
+# fall back to zlib when it is not installed (both return unsigned values)
+try:
+    from libdeflate import crc32 as _crc32
+except ImportError:
+    from zlib import crc32 as _crc32
+
+# drop-in replacement for _crc32 when the caller skips verification
+def _skip_crc32(data, crc: int=0):
+    return crc
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -15,11 +25,16 @@ __status__ = "Development"
 # for compressed dumping
 import gzip as gz
 import io
+import os
+
+# files up to this size are fully read (and decompressed) in memory on load
+INMEMORY_LIMIT = 64*1024*1024 # 64 MiB
 
 from common.constants import * 
 
 from datalayer.db_manager import DBManager
 
+from datalayer import node_parser
 from datalayer.radix_hash import RadixHash
 from datalayer.hnsw import HNSW
 from datalayer.hash_algorithm.hash_algorithm import HashAlgorithm
@@ -36,13 +51,20 @@ from common.errors import ApotFileReadError
 # preferred file extension
 PREFERRED_FILEEXT = ".apo"
 
+import struct
+# precompiled decoder for the <N_LAYER><N_NEIGHS> header pair (big-endian, see BYTE_ORDER)
+_LAYER_NEIGHS = struct.Struct('>II')
+
 class Apotheosis():
     def __init__(self, M=0, ef=0, Mmax=0, Mmax0=0,\
                     distance_algorithm=None,\
                     heuristic=False, extend_candidates=True, keep_pruned_conns=True,\
                     beer_factor: float=0,\
-                    filename=None, hash_node_class=None):
-        """Default constructor."""
+                    filename=None, hash_node_class=None, verify: bool=True):
+        """Default constructor.
+        When loading from filename, verify=False skips the CRC32 integrity checks
+        of the file (faster load, only advisable when the file is trusted).
+        """
         if filename == None:
             self._create_empty(M=M, ef=ef, Mmax=Mmax, Mmax0=Mmax0, distance_algorithm=distance_algorithm,\
                                 heuristic=heuristic, extend_candidates=extend_candidates, keep_pruned_conns=keep_pruned_conns,\
@@ -52,10 +74,17 @@ class Apotheosis():
                 db_manager = DBManager()
             else:
                 db_manager = None
+            # CRC32 of the sections is only computed (and checked) when verifying
+            crc32 = _crc32 if verify else _skip_crc32
             # open the file and load structures from filename
             with open(filename, "rb") as f:
                 # check if file is compressed and do stuff, if necessary
                 f = Apotheosis._check_compression(f)
+                # parsing below does many tiny f.read() calls -- make sure they hit
+                # a large user-space buffer instead of the raw file/GzipFile object
+                # (BytesIO is already in memory, no extra buffering needed)
+                if not isinstance(f, (io.BufferedReader, io.BytesIO)):
+                    f = io.BufferedReader(f, buffer_size=128*1024)
                 # read the header and process
                 data = f.read(HEADER_SIZE)
                 # check header (file format and version match)
@@ -63,8 +92,8 @@ class Apotheosis():
                 logger.debug(f"CRCs read: bcfg={hex(rCRC32_bcfg)}, bep={hex(rCRC32_bep)}, bnodes={hex(rCRC32_bnodes)}")
                 # check HNSW cfg and load it if no error
                 data = f.read(CFG_SIZE)
-                CRC32_bcfg = zlib.crc32(data) & 0xffffffff
-                if CRC32_bcfg != rCRC32_bcfg:
+                CRC32_bcfg = crc32(data)
+                if verify and CRC32_bcfg != rCRC32_bcfg:
                     raise ApotFileReadError(f"CRC32 {hex(CRC32_bcfg)} of HNSW configuration does not match (should be {hex(rCRC32_bcfg)})")
                 self._HNSW = HNSW.load_cfg_from_bytes(data)
 
@@ -72,72 +101,95 @@ class Apotheosis():
                     raise ApotheosisUnmatchDistanceAlgorithmError
 
                 self._distance_algorithm = self._HNSW.get_distance_algorithm()
+                # radix tree is filled inline as nodes are created below,
+                # avoiding a second full HNSW traversal after the file is read
+                self._radix = RadixHash(self._distance_algorithm)
                 data_to_node = {}
                 logger.debug(f"Reading enter point from file \"{filename}\" ...")
-                # now, process enter point
-                ep, data_to_node, data_neighs, CRC32_bep, _ = \
+                # now, process enter point (data_to_node is mutated in place)
+                ep, CRC32_bep = \
                         Apotheosis._load_node_from_fp(f, data_to_node, with_layer=True,
-                                                        algorithm=distance_algorithm, db_manager=db_manager, hash_node_class=hash_node_class)
-                if CRC32_bep != rCRC32_bep:
+                                                        algorithm=distance_algorithm, db_manager=db_manager, hash_node_class=hash_node_class,
+                                                        verify=verify)
+                if verify and CRC32_bep != rCRC32_bep:
                     raise ApotFileReadError(f"CRC32 {hex(CRC32_bep)} of enter point does not match (should be {hex(rCRC32_bep)})")
 
                 self._HNSW._enter_point  = ep
                 self._HNSW._insert_node(ep) # internal, add the node to nodes dict
+                self._radix.insert(ep)
                 # finally, process each node in each layer
                 n_layers = f.read(I_SIZE)
-                bnodes = n_layers
+                # thread a running CRC through the nodes section instead of
+                # accumulating the raw bytes (O(N^2) bytes concatenation)
+                CRC32_bnodes = crc32(n_layers)
                 n_layers = int.from_bytes(n_layers, byteorder=BYTE_ORDER)
                 logger.debug(f"Reading {n_layers} layers ...")
-                
-                data_neighs = {}
+                # use the compiled record parser when we can (numba installed,
+                # whole file already in memory, and fixed-size u4 records)
+                fast_parse = node_parser.NUMBA_AVAILABLE and isinstance(f, io.BytesIO)\
+                                and hash_node_class.internal_serial_is_u4()
+
+                # flat plan of (node, {layer: neighbor data}) pairs to link once
+                # every node exists -- no intermediate aggregation dict needed
+                pending_neighs = []
                 for _layer in range(0, n_layers):
                     # read the layer number
                     layer = f.read(I_SIZE)
-                    bnodes += layer
+                    CRC32_bnodes = crc32(layer, CRC32_bnodes)
                     layer = int.from_bytes(layer, byteorder=BYTE_ORDER)
                     # read the number of nodes in this layer
                     neighs_to_read = f.read(I_SIZE)
-                    bnodes += neighs_to_read
+                    CRC32_bnodes = crc32(neighs_to_read, CRC32_bnodes)
                     neighs_to_read = int.from_bytes(neighs_to_read, byteorder=BYTE_ORDER)
                     logger.debug(f"Reading {neighs_to_read} nodes at L{layer} ...")
-                    for idx in range(0, neighs_to_read):
-                        new_node, data_to_node, current_pageid_neighs, _, bnode = \
-                            Apotheosis._load_node_from_fp(f, data_to_node,
-                                                        algorithm=distance_algorithm, db_manager=db_manager, hash_node_class=hash_node_class)
+                    # parse first the raw records of the whole layer ...
+                    if fast_parse:
+                        records, bchunk = node_parser.parse_layer_records(f, neighs_to_read)
+                        CRC32_bnodes = crc32(bchunk, CRC32_bnodes)
+                    else:
+                        records = []
+                        for idx in range(0, neighs_to_read):
+                            data, _, neighs_data, CRC32_bnodes = \
+                                Apotheosis._parse_node_raw(f, hash_node_class=hash_node_class, crc=CRC32_bnodes,
+                                                        verify=verify)
+                            records.append((data, neighs_data))
+
+                    # ... then resolve all unseen data against the DB with one
+                    # batched query per layer (avoids the N+1 query pattern)
+                    if db_manager:
+                        missing = [data for data, _ in records if data_to_node.get(data) is None]
+                        if len(missing) > 0:
+                            data_to_node.update(hash_node_class.create_nodes_from_DB(db_manager, missing, distance_algorithm))
+
+                    for data, neighs_data in records:
+                        if db_manager:
+                            new_node = data_to_node[data]
+                            pending_neighs.append((new_node, neighs_data))
+                        else:
+                            new_node = hash_node_class(data, distance_algorithm)
                         new_node.set_max_layer(layer)
                         self._HNSW._insert_node(new_node) # internal, add the node to nodes dict
-                        data_neighs.update(current_pageid_neighs)
-                        bnodes += bnode
-
-                CRC32_bnodes = zlib.crc32(bnodes) & 0xffffffff
+                        self._radix.insert(new_node)
                 logger.debug(f"Nodes loaded correctly. CRC32 computed: {hex(CRC32_bnodes)}")
-                if CRC32_bnodes != rCRC32_bnodes:
+                if verify and CRC32_bnodes != rCRC32_bnodes:
                     raise ApotFileReadError(f"CRC32 {hex(CRC32_bnodes)} of nodes does not match (should be {hex(rCRC32_bnodes)})")
             # all done here, except we need to link neighbors...
-            for data in data_neighs:
-                # search the node -- this search should always return something
-                try:
-                    node = data_to_node[data]
-                except Exception as e:
-                    raise ApotFileReadError(f"Node with data {data} not found. Is this data correct?")
-
-                neighs = data_neighs[data]
-                for layer in neighs:
-                    logger.debug(f"Recreating nodes at L{layer} ...")
-                    neighs_at_layer = neighs[layer]
-                    for neigh in neighs_at_layer:
-                        logger.debug(f"Recreating node with data {neigh} at L{layer} ...")
-                        # search the node -- this search should always return something
-                        try:
-                            neigh_node = data_to_node[neigh]
-                        except Exception as e:
-                            raise ApotFileReadError(f"Node with pageid {neigh} not found. Is this code correct?")
-                        # add the link between them
-                        node.add_neighbor(layer, neigh_node)
-                        # (the other link will be set later, when processing the neigh as node)
-
-            # recreate radix tree from HNSW (we can do it also in the loop above)
-            self._radix = RadixHash(self._distance_algorithm, self._HNSW)
+            # hot loop: single pass over the flat plan built while parsing;
+            # hoist the dict/method lookups and let KeyError propagate once
+            # instead of probing every single lookup with try/except
+            # (duplicate links are harmless, neighbors live in per-layer sets)
+            get_node = data_to_node.__getitem__
+            try:
+                for node, neighs in pending_neighs:
+                    add_neighbor = node.add_neighbor
+                    for layer, neighs_at_layer in neighs.items():
+                        for neigh in neighs_at_layer:
+                            # add the link between them
+                            # this search should always return something
+                            add_neighbor(layer, get_node(neigh))
+                            # (the other link will be set later, when processing the neigh as node)
+            except KeyError as e:
+                raise ApotFileReadError(f"Node with data {e.args[0]} not found. Is this data correct?")
     
     def _create_empty(self, M=0, ef=0, Mmax=0, Mmax0=0,\
                         distance_algorithm=None,\
@@ -152,102 +204,116 @@ class Apotheosis():
         self._radix = RadixHash(distance_algorithm)
 
     @classmethod
-    def _load_node_from_fp(cls, f, data_to_node: dict,
-                                with_layer:bool=False, algorithm: HashAlgorithm=None, db_manager=None, 
-                                hash_node_class=None):
-        """Loads a node from a file pointer f.
-        It is necessary to have a db_manager to load external data on Apotheasis
-        (we only keep internal data and their relationships, nothing else -- more data associated to nodes
-        should be on an external database).
-        Raises NodeUnsupportedAlgorithm if the algorithm is not supported by the hash_node_class
+    def _parse_node_raw(cls, f, with_layer: bool=False, hash_node_class=None, crc: int=0,
+                            verify: bool=True):
+        """Parses the serialized form of a node from a file pointer f, without touching the DB.
+        Returns the node data, its max layer ('(no layer)' unless with_layer), the per-layer
+        neighbor data, and the running CRC32 updated with every byte read.
 
         Arguments:
         f               -- file pointer to read from
-        data_to_node    -- dict to map data to HashNode (necessary for rebuilding indexes)
         with_layer      -- bool flag to indicate if we need to read the layer for this node (default False)
-        algorithm       -- associated distance algorithm
-        db_manager      -- db_manager to handle connections to DB (optional)
-        hash_node_class -- node class stored in the Apotheosis file 
+        hash_node_class -- node class stored in the Apotheosis file
+        crc             -- initial CRC32 value to update with the bytes read (default 0)
+        verify          -- bool flag to compute the running CRC32 (default True)
         """
-        logger.debug("Loading a new node from file pointer ...")
+        crc32 = _crc32 if verify else _skip_crc32
+        # this runs once per node: avoid evaluating debug f-strings when debug is off
+        _is_debug = logger.isEnabledFor(logging.DEBUG)
+        if _is_debug:
+            logger.debug("Loading a new node from file pointer ...")
 
         bdata, data = hash_node_class.internal_load(f)
-        bnode       = bdata
+        crc         = crc32(bdata, crc)
         max_layer   = '(no layer)'
         if with_layer:
             max_layer   = f.read(I_SIZE)
-            bnode      += max_layer
+            crc         = crc32(max_layer, crc)
             max_layer   = int.from_bytes(max_layer, byteorder=BYTE_ORDER)
 
-        logger.debug(f"Read data: {data}, layer: {max_layer} ...")
         # read neighborhoods
         nhoods      = f.read(I_SIZE)
-        logger.debug(f"Read neighborhoods: {nhoods} ...")
-        bnode      += nhoods
+        crc         = crc32(nhoods, crc)
         nhoods      = int.from_bytes(nhoods, byteorder=BYTE_ORDER)
-        logger.debug(f"Node data {data} with {nhoods} neighborhoods, starts processing ...")
+        if _is_debug:
+            logger.debug(f"Node data {data} (layer: {max_layer}) with {nhoods} neighborhoods, starts processing ...")
         neighs_data = {}
         layer = 0
         # process each neighborhood, per layer and neighbors in that layer
         for nhood in range(0, nhoods):
-            logger.debug(f"Processing neighborhood {nhood} ...")
-            layer   = f.read(I_SIZE)
-            neighs  = f.read(I_SIZE)
-            logger.debug(f"Read {neighs} neighbors and layer {layer} ...")
-            bnode  += layer + neighs
-            layer   = int.from_bytes(layer, byteorder=BYTE_ORDER)
-            neighs  = int.from_bytes(neighs, byteorder=BYTE_ORDER)
-            neighs_data[layer] = []
-            # get now the neighs data at this layer
-            for idx_neigh in range(0, neighs):
-                neigh_bdata, neigh_data = hash_node_class.internal_load(f)
-                logger.debug(f"Read neigh data: {neigh_data} ...")
-                bnode        += neigh_bdata
-                neighs_data[layer].append(neigh_data)
-            logger.debug(f"Processed {neighs} at L{layer} ({neighs_data})")
-
-        CRC32_bnode = zlib.crc32(bnode) & 0xffffffff
-        logger.debug(f"New node with {data} at L{layer} successfully read. Neighbors data: {neighs_data}. Computed CRC32: {hex(CRC32_bnode)}")
+            # decode the <N_LAYER><N_NEIGHS> pair with a single read + unpack
+            hdr     = f.read(I_SIZE*2)
+            crc     = crc32(hdr, crc)
+            layer, neighs = _LAYER_NEIGHS.unpack(hdr)
+            # and batch-read the whole neighborhood in one shot
+            bneighs, neighs_list = hash_node_class.internal_load_many(f, neighs)
+            crc     = crc32(bneighs, crc)
+            neighs_data[layer] = neighs_list
+            if _is_debug:
+                logger.debug(f"Processed {neighs} at L{layer} ({neighs_data})")
+
+        if _is_debug:
+            logger.debug(f"New node with {data} at L{layer} successfully read. Neighbors data: {neighs_data}. Updated CRC32: {hex(crc)}")
+        return data, max_layer, neighs_data, crc
+
+    @classmethod
+    def _load_node_from_fp(cls, f, data_to_node: dict,
+                                with_layer:bool=False, algorithm: HashAlgorithm=None, db_manager=None,
+                                hash_node_class=None, crc: int=0, verify: bool=True):
+        """Loads a node from a file pointer f.
+        It is necessary to have a db_manager to load external data on Apotheasis
+        (we only keep internal data and their relationships, nothing else -- more data associated to nodes
+        should be on an external database).
+        The bytes read are fed into a running CRC32 (seeded with crc) which is returned to the caller,
+        so no byte accumulation is needed to verify checksums.
+        Raises NodeUnsupportedAlgorithm if the algorithm is not supported by the hash_node_class
+
+        Arguments:
+        f               -- file pointer to read from
+        data_to_node    -- dict to map data to HashNode (necessary for rebuilding indexes)
+        with_layer      -- bool flag to indicate if we need to read the layer for this node (default False)
+        algorithm       -- associated distance algorithm
+        db_manager      -- db_manager to handle connections to DB (optional)
+        hash_node_class -- node class stored in the Apotheosis file
+        crc             -- initial CRC32 value to update with the bytes read (default 0)
+        verify          -- bool flag to compute the running CRC32 (default True)
+        """
+        data, max_layer, neighs_data, crc = cls._parse_node_raw(f, with_layer=with_layer,
+                                                        hash_node_class=hash_node_class, crc=crc,
+                                                        verify=verify)
 
         # retrieve the specific data information from database and get an appropriate HashNode
         logger.debug("Recovering data now from DB, if necessary ...")
         new_node    = None
-        data_neighs = {}
         if db_manager:
             if data_to_node.get(data) is None:
                 new_node = hash_node_class.create_node_from_DB(db_manager, data, algorithm)
                 if with_layer:
                     new_node.set_max_layer(max_layer)
-                # store it for next iterations
+                # store it for next iterations (data_to_node is mutated in place)
                 data_to_node[data] = new_node
             else:
                 new_node = data_to_node[data]
             logger.debug(f"Initial data set to new node: \"{new_node.get_id()}\" at L{max_layer}")
-
-            # get now the neighboors
-            if data_neighs.get(data) is None:
-                data_neighs[data] = {}
-            for layer, neighs_list in neighs_data.items():
-                if data_neighs[data].get(layer) is None:
-                    data_neighs[data][layer] = set()
-                data_neighs[data][layer].update(neighs_list)
         else:
             new_node = hash_node_class(data, algorithm) # create a new node with the data and algorithm
             logger.debug("No db_manager was given, skipping data retrieval from DB ...")
 
-        return new_node, data_to_node, data_neighs, CRC32_bnode, bnode
+        return new_node, crc
 
     @classmethod
-    def load(cls, filename:str=None, distance_algorithm=None, hash_node_class=None):
+    def load(cls, filename:str=None, distance_algorithm=None, hash_node_class=None, verify: bool=True):
         """Restores Apotheosis structure from permanent storage.
 
         Arguments:
         filename            -- filename to load
         distance_algorithm  -- distance algorithm to check in the file
-        hash_node_class     -- node class stored in the Apotheosis file 
+        hash_node_class     -- node class stored in the Apotheosis file
+        verify              -- bool flag to check the CRC32s of the file contents (default True);
+                               skipping the checks is faster, but only advisable on trusted files
         """
         logger.info(f"Restoring Apotheosis [{hash_node_class.__class__.__name__}] structure from disk (filename \"{filename}\", distance algorithm {distance_algorithm}\") ...")
-        newAPO = Apotheosis(filename=filename, distance_algorithm=distance_algorithm, hash_node_class=hash_node_class)
+        newAPO = Apotheosis(filename=filename, distance_algorithm=distance_algorithm, hash_node_class=hash_node_class, verify=verify)
         return newAPO
 
     @classmethod
@@ -263,13 +329,27 @@ class Apotheosis():
             start_of_file = fp.read(1024)
             fp.seek(0)
             compressed = start_of_file.startswith(magic)
-        
+
         # if compressed, load the appropriate file
         if not compressed:
-            logger.debug(f"Not compressed. Desearializing it directly ...")
+            if os.path.getsize(f.name) <= INMEMORY_LIMIT:
+                # small file: read it fully and parse from memory, the many
+                # tiny reads then cost no syscalls at all
+                logger.debug(f"Not compressed (small). Reading in memory and deserializing ...")
+                with open(f.name, 'rb') as fp:
+                    f = io.BytesIO(fp.read())
+            else:
+                logger.debug(f"Not compressed. Desearializing it directly ...")
         else:
-            logger.debug(f"Compressed. Decompressing and deserializing ...")
-            f = gz.GzipFile(f.name)
+            if os.path.getsize(f.name) <= INMEMORY_LIMIT:
+                # small file: decompress it in one shot and parse from memory,
+                # avoiding the per-read overhead of GzipFile on tiny reads
+                logger.debug(f"Compressed (small). Decompressing in memory and deserializing ...")
+                with open(f.name, 'rb') as fp:
+                    f = io.BytesIO(gz.decompress(fp.read()))
+            else:
+                logger.debug(f"Compressed. Decompressing and deserializing ...")
+                f = gz.GzipFile(f.name)
         return f
 
     @classmethod
@@ -410,12 +490,12 @@ class Apotheosis():
 
         logger.debug("Serializing HNSW configuration ... ") 
         bcfg = self._HNSW.serialize_cfg() 
-        CRC32_bcfg = zlib.crc32(bcfg) & 0xffffffff
+        CRC32_bcfg = _crc32(bcfg)
         logger.debug("Serializing enter point ... ") 
         ep = self._HNSW.get_enter_point()
         bep = self._serialize_apoth_node(ep, with_layer=True)
         # guarantees compatibility -- https://stackoverflow.com/questions/30092226/
-        CRC32_bep = zlib.crc32(bep) & 0xffffffff
+        CRC32_bep = _crc32(bep)
         # now, iterate on layers, printing each node and its neighbors
         bnodes = bytes() 
         # write first the number of layers
@@ -438,7 +518,7 @@ class Apotheosis():
         # we add again the ep, as it was removed before (when doing "node_list.remove(ep)")
         self._HNSW._insert_node(ep)
 
-        CRC32_bnodes = zlib.crc32(bnodes) & 0xffffffff
+        CRC32_bnodes = _crc32(bnodes)
         logger.debug(f"CRC32s computed: bcfg={hex(CRC32_bcfg)}, bep={hex(CRC32_bep)}, bnodes={hex(CRC32_bnodes)}...")
         logger.debug("All data from objects serialized. Dumping to file now ...")
          
@@ -505,9 +585,11 @@ class Apotheosis():
         logger.info(f"Trying exact match for \"{hash_value}\" ... found? {found}")
         return found, node
 
-    def knn_search(self, query=None, k:int=0, ef=0, hashid=0):
-        """If query is present in the Apotheosis structure, returns True, the node found, and the K nearest neighbors to query. 
+    def knn_search(self, query=None, k:int=0, ef=0, hashid=0, legacy=True):
+        """If query is present in the Apotheosis structure, returns True, the node found, and the K nearest neighbors to query.
         Otherwise, returns False, None, and the approximate K nearest neighbors to query.
+        The neighbors come as a dict keyed by similarity score, or as a flat list of
+        (score, node) pairs sorted by score when legacy=False.
         It raises the following exceptions:
             * ApotheosisUnmatchDistanceAlgorithmError if the distance algorithm of the new node is distinct than 
               the distance algorithm associated to the HNSW structure.
@@ -518,6 +600,7 @@ class Apotheosis():
         k       -- number of nearest neighbors to query node to return
         ef      -- exploration factor (search recall)
         hashid  -- hash str to search
+        legacy  -- bool to return the legacy dict of score -> list of nodes (default) instead of the flat sorted list
         """
         if hashid != 0:
             # create node and make the search again...
@@ -530,18 +613,20 @@ class Apotheosis():
         if exact: # get k-nn at layer 0, using HNSW structure
             # as node exists, this call is safe
             logger.debug(f"Node \"{query.get_id()}\" found in the radix tree! Recovering now its neighbors from HNSW ... ")
-            knn_dict = self._HNSW.get_knn_node_at_layer(node, k, layer=0) 
+            knn_dict = self._HNSW.get_knn_node_at_layer(node, k, layer=0, legacy=legacy)
         else: # get approximate k-nns with HNSW search
             logger.debug(f"Node \"{query.get_id()}\" NOT found in the radix tree! Recovering now its approximate neighbors ... ")
-            knn_dict = self._HNSW.aknn_search(query, k, ef)    # log N, see Section 4.2.1 in MY-TPAMI-20
+            knn_dict = self._HNSW.aknn_search(query, k, ef, legacy=legacy)    # log N, see Section 4.2.1 in MY-TPAMI-20
             node = None
 
         return exact, node, knn_dict
 
-    def threshold_search(self, query, threshold, n_hops):
+    def threshold_search(self, query, threshold, n_hops, legacy=True):
         """Performs a threshold search to retrieve nodes that satisfy a certain similarity threshold using the HNSW structure.
-        If query is present in the Apotheosis structure, returns True, the node found, and the list of nearest neighbor nodes 
+        If query is present in the Apotheosis structure, returns True, the node found, and the list of nearest neighbor nodes
         to query that satisfy the specified similarity threshold.
+        The neighbors come as a dict keyed by similarity score, or as a flat list of
+        (score, node) pairs sorted by score when legacy=False.
         Otherwise, returns False, None, and the approximate K nearest neighbors to query.
         It raises the following exceptions:
             * ApotheosisUnmatchDistanceAlgorithmError if the distance algorithm of the new node is distinct than 
@@ -550,8 +635,9 @@ class Apotheosis():
 
         Arguments:
         query      -- the query node for which to find the neighbors with a similarity above the given percentage
-        threshold  -- the similarity threshold to satisfy 
+        threshold  -- the similarity threshold to satisfy
         n_hops     -- number of hops to perform from each nearest neighbor
+        legacy     -- bool to return the legacy dict of score -> list of nodes (default) instead of the flat sorted list
         """
        
         self._sanity_checks(query)
@@ -564,7 +650,7 @@ class Apotheosis():
             knn_dict = self._HNSW.get_thresholdnn_at_node(query, threshold) 
         else: # get approximate k-nns with HNSW search
             logger.debug(f"Node \"{query.get_id()}\" NOT found in the radix tree! Recovering now its approximate neighbors ... ")
-            knn_dict = self._HNSW.threshold_search(query, threshold, n_hops)
+            knn_dict = self._HNSW.threshold_search(query, threshold, n_hops, legacy=legacy)
             node = None
 
         return exact, node, knn_dict
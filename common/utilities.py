@@ -107,25 +107,29 @@ def configure_logging(loglevel, logger=None):
     console.setFormatter(formatter)
     console.setLevel(loglevel)
 
-def print_results(results: dict, show_keys=False):
-    """Print a dictionary of (similarity score, hash) in the output.
+def print_results(results, show_keys=False):
+    """Print search results (similarity score, hash) in the output, ordered by similarity score.
 
     Arguments:
-    results     -- dictionary to print
-    show_keys   -- bool to print each key along with each hash of the dict
+    results     -- search results, either a flat list of (score, node) pairs (already
+                   sorted by score, see legacy=False searches) or the legacy dict of
+                   score -> list of nodes
+    show_keys   -- bool to print each score along with each hash
     """
 
-    # iterate now in the results. If we sort the keys, we can get them ordered by similarity score
-    keys = sorted(results.keys())
+    if isinstance(results, dict):
+        # legacy form: flatten once and sort, instead of sorting the keys
+        # and looking every bucket up again
+        results = sorted(((key, node) for key, nodes in results.items() for node in nodes),
+                            key=lambda pair: pair[0])
 
     idx = 1
-    for key in keys:
-        for node in results[key]:
-            _str = f"Node ID {idx}: \"{node.get_id()}\""
-            if show_keys:
-                _str += f" (score: {key})"
-            print(_str)
-            idx += 1
+    for key, node in results:
+        _str = f"Node ID {idx}: \"{node.get_id()}\""
+        if show_keys:
+            _str += f" (score: {key})"
+        print(_str)
+        idx += 1
 
 def configure_argparse() -> argparse.ArgumentParser:
     """Configures argparse to receive HNSW parameters + loglevel."""
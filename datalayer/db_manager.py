@@ -72,6 +72,32 @@ class DBManager():
         session.close()
         return win_module_hash_node
 
+    def get_winmodules_data_by_pageids(self, page_ids: list=None, algorithm=HashAlgorithm):
+        """Returns a dict mapping each page id in page_ids to its WinModuleHashNode,
+        retrieving all of them with a single batched query.
+        Raises PageIdValueNotInDBError if any page id is not in the database
+        """
+        logger.info(f"Getting results for {len(page_ids)} page ids from DB ({algorithm.__name__}) ...")
+        session = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=self.engine))
+        stmt = select(Page, Module).filter(
+                    Page.id.in_(page_ids)
+                    ).filter(
+                    Page.module_id == Module.id
+                    )
+        nodes = {}
+        for row in session.execute(stmt):
+            page    = row[0]
+            module  = row[1]
+            # create the node now (see get_winmodule_data_by_pageid)
+            nodes[page.id] = WinModuleHashNode(page.hashTLSH, TLSHHashAlgorithm, module=module, page=page)
+
+        session.close()
+        if len(nodes) != len(set(page_ids)): # some page id is NOT in database
+            missing = set(page_ids) - set(nodes.keys())
+            logger.debug(f"Error! values {missing} not in DB")
+            raise PageIdValueNotInDBError
+        return nodes
+
     def get_winmodule_data_by_hash(self, algorithm: str="", hash_value: str=""):
         logger.info(f"Getting results for \"{hash_value}\" from DB ({algorithm})")
         session = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=self.engine))
@@ -7,6 +7,21 @@ class HashAlgorithm(ABC):
     def compare(cls, hash1, hash2):
         pass
 	
+    # batched version of compare: one Python-level call per expanded
+    # neighborhood instead of one per neighbor (subclasses may override
+    # it with a vectorized kernel, this generic fallback just loops)
+    @classmethod
+    def compare_batch(cls, hash1, hash_list):
+        compare = cls.compare
+        return [compare(hash1, hash2) for hash2 in hash_list]
+
+    # unpacks a digest into the array form expected by the compiled batch
+    # kernels; None means there is no compiled kernel for this algorithm
+    # and callers must stay on compare/compare_batch (see HashNode)
+    @classmethod
+    def unpack_digest(cls, digest):
+        return None
+
     @classmethod
     @abstractmethod
     def get_score_trend(cls):
@@ -1,16 +1,49 @@
 import tlsh
+import numpy as np
 
 from datalayer.hash_algorithm.hash_algorithm import HashAlgorithm
+from datalayer.hash_algorithm import tlsh_numba
 from datalayer.hash_algorithm.score_trend import ScoreTrend
 
 from common.errors import CharHashValueNotInAlphabetError
 
 class TLSHHashAlgorithm(HashAlgorithm):
-    
+
     @classmethod
     def compare(cls, hash1, hash2):
         return tlsh.diff(hash1, hash2)
 
+    @classmethod
+    def unpack_digest(cls, digest):
+        if not tlsh_numba.NUMBA_AVAILABLE:
+            return None # no compiled kernels, stick to tlsh.diff
+        return tlsh_numba.digest_to_array(digest)
+
+    @classmethod
+    def compare_unpacked(cls, array1, array2):
+        """Returns the TLSH distance between two unpacked digests, using the
+        compiled scalar kernel (no hex re-parsing, unlike tlsh.diff).
+
+        Arguments:
+        array1  -- first unpacked digest (see unpack_digest)
+        array2  -- second unpacked digest
+        """
+        return int(tlsh_numba.tlsh_diff(array1, array2))
+
+    @classmethod
+    def compare_unpacked_batch(cls, query_array, candidate_arrays):
+        """Returns the TLSH distances between an unpacked query digest and a
+        list of unpacked candidate digests, using the compiled batch kernel.
+
+        Arguments:
+        query_array         -- unpacked query digest (see unpack_digest)
+        candidate_arrays    -- list of unpacked candidate digests
+        """
+        # tolist: scores become plain ints, as compare/compare_unpacked
+        # return them -- np.int32 keys would leak into the result dicts
+        # and break their JSON serialization (see rest.py)
+        return tlsh_numba.tlsh_diff_batch(query_array, np.stack(candidate_arrays)).tolist()
+
     @classmethod
     def get_max_hash_alphalen(cls) -> int:
         # hash alphabet: hexadecimal bytes + 'T'
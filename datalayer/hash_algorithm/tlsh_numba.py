@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Optional compiled kernels for the TLSH distance.
+
+tlsh.diff scores one pair of hex digests per call, which means one Python
+call (plus two digest parses inside the C library) per visited neighbor.
+These kernels work instead on digests unpacked once into uint8 arrays
+(see digest_to_array) and score a whole candidate batch per call with a
+Numba njit loop. When numba is not installed callers should keep using
+tlsh.diff; check NUMBA_AVAILABLE before calling the kernels.
+
+The distance matches the reference TLSH implementation: header diff
+(checksum + L value + Q ratios, with modular arithmetic) plus the weighted
+ternary body diff over 2-bit bucket pairs.
+"""
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    def njit(*args, **kwargs): # no-op decorator, the kernels are never called
+        def _wrap(func):
+            return func
+        return _wrap
+
+__author__ = "Daniel Huici Meseguer and Ricardo J. Rodríguez"
+__copyright__ = "Copyright 2024"
+__credits__ = ["Daniel Huici Meseguer", "Ricardo J. Rodríguez"]
+__license__ = "GPL"
+__version__ = "0.1"
+__maintainer__ = "Daniel Huici"
+__email__ = "reverseame@unizar.es"
+__status__ = "Development"
+
+# unpacked digest layout (uint8): [checksum, L, Q, body x 32]
+DIGEST_ARRAY_LEN = 35
+
+def _build_body_diff_lut() -> np.ndarray:
+    """Builds a 256x256 LUT with the weighted ternary diff of all four 2-bit
+    bucket pairs of a byte pair. One lookup then scores a whole body byte,
+    instead of four shift/mask/abs/branch lane computations per byte.
+    """
+    lanes = np.arange(256, dtype=np.int16)
+    lut   = np.zeros((256, 256), dtype=np.uint8) # max value is 4*6 = 24
+    for shift in (0, 2, 4, 6):
+        lane = (lanes >> shift) & 0x03
+        d    = np.abs(lane[:, None] - lane[None, :])
+        lut += np.where(d == 3, 6, d).astype(np.uint8)
+    return lut
+
+_BODY_DIFF_LUT = _build_body_diff_lut()
+
+def _build_header_diff_luts():
+    """Builds 256x256 LUTs with the header penalties of a byte pair: the
+    circular mod-256 L value distance and the per-nibble circular mod-16
+    Q ratio distances, both with the x12 scaling of the spec. One load per
+    header byte then replaces the modular arithmetic and its branches.
+    (A single 256-entry XOR table cannot express these: circular distances
+    are not functions of a^b.)
+    """
+    vals = np.arange(256, dtype=np.int32)
+    # L value: circular distance mod 256, scaled x12 when above 1
+    ldiff = np.abs(vals[:, None] - vals[None, :])
+    ldiff = np.minimum(ldiff, 256 - ldiff)
+    l_lut = np.where(ldiff > 1, ldiff*12, ldiff).astype(np.int16)
+    # Q ratios: circular distance mod 16 per nibble, (qdiff - 1)x12 when above 1
+    q_lut = np.zeros((256, 256), dtype=np.int16)
+    for shift in (0, 4):
+        nibble = (vals >> shift) & 0x0F
+        qdiff  = np.abs(nibble[:, None] - nibble[None, :])
+        qdiff  = np.minimum(qdiff, 16 - qdiff)
+        q_lut += np.where(qdiff > 1, (qdiff - 1)*12, qdiff).astype(np.int16)
+    return l_lut, q_lut
+
+_L_DIFF_LUT, _Q_DIFF_LUT = _build_header_diff_luts()
+
+# bits set per byte value; one gather per XORed body byte instead of the
+# 8x row expansion np.unpackbits needs before summing
+_POPCOUNT_LUT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None],
+                                axis=1).sum(axis=1).astype(np.uint8)
+
+# numpy >= 2.0 exposes the hardware popcount as a ufunc: counting over
+# uint64 words handles 8 body bytes per op, with no table gather at all
+_HAS_BITWISE_COUNT = hasattr(np, "bitwise_count")
+
+def digest_to_array(digest: str) -> np.ndarray:
+    """Unpacks a TLSH hex digest into a uint8 array of DIGEST_ARRAY_LEN bytes.
+    Supports both old (70 hex chars) and versioned "T1"-prefixed digests.
+    The header bytes are nibble-unswapped, as the hex form stores them
+    swapped (see to_hex in the reference implementation).
+
+    Arguments:
+    digest  -- TLSH digest, as the usual hex string
+    """
+    if digest[0] in ('T', 't'): # versioned digest, e.g. "T1..."
+        digest = digest[2:]
+    raw = np.frombuffer(bytes.fromhex(digest), dtype=np.uint8).copy()
+    # undo the nibble swap of the header bytes (checksum, L value, Q ratios)
+    raw[0:3] = ((raw[0:3] & 0x0F) << 4) | (raw[0:3] >> 4)
+    return raw
+
+# explicit signatures: digests are always C-contiguous uint8 rows (see
+# digest_to_array / np.stack in the callers), declaring it lets the
+# compiler emit fixed-stride, vectorizable loops instead of a generic
+# strided specialization; cache=True keeps the eager compile a one-off
+@njit('int64(uint8[::1], uint8[::1])', cache=True)
+def tlsh_diff(a, b): # pragma: no cover (compiled)
+    """Returns the TLSH distance between two unpacked digests (uint8 arrays).
+
+    Arguments:
+    a   -- first unpacked digest (see digest_to_array)
+    b   -- second unpacked digest
+    """
+    # header, branchless: checksum inequality plus one LUT probe each for
+    # the L value and Q ratio penalties (see _build_header_diff_luts)
+    diff = np.int64(a[0] != b[0])
+    diff += _L_DIFF_LUT[a[1], b[1]]
+    diff += _Q_DIFF_LUT[a[2], b[2]]
+    # body: weighted ternary diff over 2-bit bucket pairs, one LUT probe per byte
+    for i in range(3, a.shape[0]):
+        diff += _BODY_DIFF_LUT[a[i], b[i]]
+    return diff
+
+def tlsh_hamming_batch(query, candidates) -> np.ndarray:
+    """Returns the XOR-popcount (Hamming) distance between the body of an
+    unpacked query digest and the body of each row of a uint8 matrix of
+    unpacked candidate digests, as an int32 array.
+
+    This is a coarse approximation of the TLSH body diff (every differing
+    bit weighs the same), meant as a cheap pre-filter before scoring the
+    survivors exactly with tlsh_diff_batch. It is pure numpy (bitwise_xor
+    plus a popcount table gather run over the whole batch in C), so it
+    does not need numba.
+
+    Arguments:
+    query       -- unpacked query digest (see digest_to_array)
+    candidates  -- uint8 matrix, one unpacked digest per row
+    """
+    xored = np.bitwise_xor(query[3:], candidates[:, 3:])
+    if _HAS_BITWISE_COUNT and xored.shape[1] % 8 == 0:
+        # repack the fresh (contiguous) XOR rows as uint64 bitboards: one
+        # hardware popcount per 8 body bytes
+        return np.bitwise_count(xored.view(np.uint64)).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT_LUT[xored].sum(axis=1, dtype=np.int32)
+
+@njit('int32[:](uint8[::1], uint8[:, ::1])', cache=True)
+def tlsh_diff_batch(query, candidates): # pragma: no cover (compiled)
+    """Returns an int32 array with the TLSH distance between an unpacked query
+    digest and each row of a 2D uint8 matrix of unpacked candidate digests.
+
+    Arguments:
+    query       -- unpacked query digest (see digest_to_array)
+    candidates  -- uint8 matrix, one unpacked digest per row
+    """
+    n = candidates.shape[0]
+    scores = np.empty(n, dtype=np.int32)
+    for i in range(n):
+        scores[i] = tlsh_diff(query, candidates[i])
+    return scores
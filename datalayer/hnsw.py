@@ -66,12 +66,17 @@ class HNSW:
         self._set_queue_factor()
         # dictionary to store all nodes of the HNSW, per level
         self._nodes = dict()
+        # id -> node index over the whole structure, for O(1) existence checks
+        self._node_by_id = dict()
         # select neighbors heuristic params
         self._heuristic = heuristic
         self._extend_candidates = extend_candidates
         self._keep_pruned_conns = keep_pruned_conns
         # research stuff
         self._beer_factor = beer_factor # random walk factor [0, 1), defines the probability of doing a random walk
+        # pool of presampled insertion levels (see _sample_level)
+        self._level_pool = None
+        self._level_pos  = 0
 
     def _is_empty(self):
         """Returns True if the HNSW structure contains no node, False otherwise."""
@@ -139,8 +144,9 @@ class HNSW:
         layer = node.get_max_layer()
         if self._nodes.get(layer) is None:
             self._nodes[layer] = list()
-        
+
         self._nodes[layer].append(node)
+        self._node_by_id[node.get_id()] = node
 
     def _set_queue_factor(self):
         if not self._distance_algorithm.is_spatial():
@@ -148,26 +154,64 @@ class HNSW:
         else:
             self._queue_factor = -1 # distance metric
 
+    @staticmethod
+    def _make_distance_fn(query_node, cache: dict):
+        """Returns a memoized distance function to query_node, backed by cache.
+        The cache is keyed on id(node), so both the cache and the returned
+        function are only valid within a single search invocation (they must
+        not outlive the nodes they have seen).
+
+        Arguments:
+        query_node  -- the base node of the distance computations
+        cache       -- dict {id(node): score} shared with _search_layer_knn
+        """
+        calculate = query_node.calculate_similarity
+        def distance(node):
+            key = id(node)
+            score = cache.get(key)
+            if score is None:
+                score = cache[key] = calculate(node)
+            return score
+        return distance
+
     def _descend_to_layer(self, query_node, layer=0):
-        """Goes down to a specific layer and returns the enter point of that layer, 
+        """Goes down to a specific layer and returns the enter point of that layer,
         which is the nearest element to query_node.
-        
+
         Arguments:
         query_node  -- the node to be inserted
         layer       -- the target layer (default 0)
         """
-        enter_point = self._enter_point
-        max_layer =  self._enter_point.get_max_layer()
+        _is_debug = logger.isEnabledFor(logging.DEBUG)
+        # distances to query_node are memoized across the visited layers
+        dcache   = {}
+        distance = HNSW._make_distance_fn(query_node, dcache)
+        queue_factor = self.get_queue_factor()
+        enter_point  = self._enter_point
+        max_layer    =  self._enter_point.get_max_layer()
+        best_key     = None # key of enter_point, lazily computed below
         for layer in range(max_layer, layer - 1, -1): # Descend to the given layer
-            logger.debug(f"Visiting layer {layer}, ep: {enter_point}")
-            current_nearest_elements = self._search_layer_knn(query_node, [enter_point], 1, layer)
-            logger.debug(f"Current nearest elements: {current_nearest_elements}")
-            if len(current_nearest_elements) > 0:
-                if enter_point.get_id() != query_node.get_id():
-                    # get the nearest element to query node if the enter_point is not the query node itself
-                    enter_point = self._find_nearest_element(query_node, current_nearest_elements)
-            else: 
-                logger.debug("First node in layer {}".format(layer))
+            if _is_debug:
+                logger.debug(f"Visiting layer {layer}, ep: {enter_point}")
+            if enter_point.get_id() == query_node.get_id():
+                # keep the enter point when it is the query node itself
+                continue
+            # an ef=1 search reduces to a greedy walk to the closest improving
+            # neighbor: inline it and carry the cache/keys across layers,
+            # instead of allocating heaps and visited sets per layer
+            if best_key is None:
+                best_key = distance(enter_point)*queue_factor
+            improved = True
+            while improved:
+                improved = False
+                for neighbor in enter_point.get_neighbors_at_layer(layer):
+                    key = distance(neighbor)*queue_factor
+                    if key > best_key: # neighbor is closer to query_node
+                        best_key    = key
+                        enter_point = neighbor
+                        improved    = True
+            if _is_debug:
+                logger.debug(f"Current nearest element: {enter_point}")
 
         return enter_point
 
@@ -195,6 +239,25 @@ class HNSW:
             self._assert_no_empty()
         return
 
+    _LEVEL_POOL_SIZE = 4096
+
+    def _sample_level(self) -> int:
+        """Returns a random insertion level, drawn from the exponential HNSW
+        level distribution (l in MY-TPAMI-20). Levels are presampled in
+        vectorized batches: numpy's per-scalar ufunc overhead made the old
+        one-log-per-insert sampling cost more than the log itself, one
+        np.log over the pool amortizes it across that many inserts.
+        """
+        pos  = self._level_pos
+        pool = self._level_pool
+        if pool is None or pos >= len(pool):
+            # 1.0 - random() yields (0, 1]: never feeds 0 to the log
+            pool = self._level_pool = \
+                    np.floor(-np.log(1.0 - np.random.random(HNSW._LEVEL_POOL_SIZE)) * self._mL).astype(np.int64)
+            pos  = 0
+        self._level_pos = pos + 1
+        return int(pool[pos])
+
     def insert(self, new_node):
         """Inserts a new node to the HNSW structure. On success, it return True
         Raises HNSWUnmatchDistanceAlgorithmError if the distance algorithm of the new node is distinct than 
@@ -209,7 +272,7 @@ class HNSW:
 
         enter_point = self._enter_point
         # Calculate the layer to which the new node belongs
-        new_node_layer = int(-np.log(random.uniform(0,1)) * self._mL) // 1 # l in MY-TPAMI-20
+        new_node_layer = self._sample_level() # l in MY-TPAMI-20
         new_node.set_max_layer(new_node_layer)
         logger.info(f"New node in HNSW: \"{new_node.get_id()}\" (assigned level={new_node_layer})")
         
@@ -262,15 +325,29 @@ class HNSW:
         logger.debug(f"Random node chosen at L{layer}: \"{elm.get_id()}\"")
         return elm
 
-    def _already_exists(self, query_node, node_list) -> bool:
+    def get_node_by_id(self, node_id):
+        """Returns the node of the HNSW structure with the given id, or None
+        if no such node exists (O(1), through the id index).
+
+        Arguments:
+        node_id -- id of the node to retrieve
+        """
+        return self._node_by_id.get(node_id)
+
+    def _already_exists(self, query_node, node_list=None) -> bool:
         """Returns True if query_node is contained in node_list, False otherwise.
+        When node_list is None, the whole structure is checked through the id
+        index (O(1) instead of a linear scan).
 
         Arguments:
         query_node  -- the node to search
-        node_list   -- the list of nodes where to search
+        node_list   -- the list of nodes where to search (None for the whole structure)
         """
+        node_id = query_node.get_id()
+        if node_list is None:
+            return node_id in self._node_by_id
         for node in node_list:
-            if node.get_id() == query_node.get_id():
+            if node.get_id() == node_id:
                 return True
         return False
 
@@ -334,10 +411,14 @@ class HNSW:
         enter_point -- the enter point to the first layer to visit 
         """
         
+        # distances to new_node are computed once (in _search_layer_knn) and
+        # reused by the neighbor selection at each visited layer
+        dcache   = {}
+        distance = HNSW._make_distance_fn(new_node, dcache)
         min_layer = min(self._enter_point.get_max_layer(), new_node.get_max_layer())
         for layer in range(min_layer, -1, -1):
-            currently_found_nn = self._search_layer_knn(new_node, enter_point, self._ef, layer)
-            new_neighbors = self._select_neighbors(new_node, currently_found_nn, self._M, layer)
+            currently_found_nn = self._search_layer_knn(new_node, enter_point, self._ef, layer, cache=dcache)
+            new_neighbors = self._select_neighbors(new_node, currently_found_nn, self._M, layer, distance=distance)
             # random walk (drunken journey)
             dj_visited_node, flag = self._drunken_journey(layer, exclude_nodes=new_neighbors)
             logger.debug(f"Found nn at L{layer}: {currently_found_nn}")
@@ -387,6 +468,7 @@ class HNSW:
                 self._nodes.pop(layer)
         except:
             raise HNSWUndefinedError
+        self._node_by_id.pop(node.get_id(), None)
 
     def delete(self, node):
         """Deletes a node from the dict of the HNSW structure.
@@ -439,7 +521,7 @@ class HNSW:
 
         logger.debug("HNSW enter point updated!")
 
-    def _search_layer_knn(self, query_node, enter_points, ef, layer):
+    def _search_layer_knn(self, query_node, enter_points, ef, layer, cache: dict=None):
         """Performs a k-NN search in a specific layer of the graph.
 
         Arguments:
@@ -447,55 +529,86 @@ class HNSW:
         enter_points    -- current enter points
         ef              -- number of nearest elements to query_node to return
         layer           -- layer number
+        cache           -- distance cache {id(node): score} scoped to this search
+                           invocation (see _make_distance_fn); both read and updated
         """
+        # hoisted guard: the f-strings below walk whole node sets in their
+        # repr, we do not want to build them when DEBUG is filtered out
+        _is_debug = logger.isEnabledFor(logging.DEBUG)
+
         visited_elements = set(enter_points) # v in MY-TPAMI-20
         candidates = [] # C in MY-TPAMI-20
-        currently_found_nearest_neighbors = set(enter_points) # W in MY-TPAMI-20
 
         # get variable for heapsort ordering, it depends on the direction of the trend score
         queue_factor = self.get_queue_factor()
-
-        # and initialize the priority queue with the existing candidates (from enter_points)
-        for candidate in set(enter_points):
-            distance = candidate.calculate_similarity(query_node)
-            heapq.heappush(candidates, (distance*queue_factor, candidate))
-
-        logger.debug(f"Performing a k-NN search of \"{query_node.get_id()}\" in layer {layer} ...")
-        logger.debug(f"Candidates list: {candidates}")
+        # distances are computed in batches, one call per expanded neighborhood
+        # (instead of one compare call per neighbor, using the compiled kernel
+        # over the cached digest arrays when available), and memoized in cache
+        # so the caller does not recompute them afterwards
+        if cache is None:
+            cache = {}
+
+        def _cache_distances(nodes):
+            missing = [n for n in nodes if id(n) not in cache]
+            if missing:
+                for n, d in zip(missing, query_node.calculate_similarity_batch(missing)):
+                    cache[id(n)] = d
+
+        # W in MY-TPAMI-20, kept as a heap of (distance*queue_factor, node) tuples
+        # mirroring candidates: with this key the furthest element is always
+        # currently_found_nearest_neighbors[0], so the old O(|W|) rescans with
+        # recomputed distances (_find_furthest_element) become a heap peek
+        currently_found_nearest_neighbors = []
+
+        # and initialize the priority queues with the existing candidates (from enter_points)
+        initial_candidates = set(enter_points)
+        _cache_distances(initial_candidates)
+        for candidate in initial_candidates:
+            key = cache[id(candidate)]*queue_factor
+            heapq.heappush(candidates, (key, candidate))
+            heapq.heappush(currently_found_nearest_neighbors, (key, candidate))
+
+        if _is_debug:
+            logger.debug(f"Performing a k-NN search of \"{query_node.get_id()}\" in layer {layer} ...")
+            logger.debug(f"Candidates list: {candidates}")
 
         while len(candidates) > 0:
-            logger.debug(f"Current NN found: {currently_found_nearest_neighbors}")
-            # get the closest and furthest nodes from our candidates list
-            furthest_node = self._find_furthest_element(query_node, currently_found_nearest_neighbors)
-            logger.debug(f"Furthest node: {furthest_node}")
-            _, closest_node = heapq.heappop(candidates)
-            logger.debug(f" Closest node: {closest_node}")
-
-            # closest node @candidates list is closer than furthest node @currently_found_nearest_neighbors            
-            n2_is_closer_n1, _, _ = query_node.n2_closer_than_n1(n1=closest_node, n2=furthest_node)
-            if n2_is_closer_n1:
+            if _is_debug:
+                logger.debug(f"Current NN found: {currently_found_nearest_neighbors}")
+            # get the closest node from our candidates list and
+            # peek the furthest node from our current nearest neighbors
+            closest_key, closest_node = heapq.heappop(candidates)
+            furthest_key = currently_found_nearest_neighbors[0][0]
+            if _is_debug:
+                logger.debug(f" Closest node: {closest_node}")
+
+            # closest node @candidates list is closer than furthest node @currently_found_nearest_neighbors
+            if closest_key < furthest_key:
                 logger.debug("All elements in current nearest neighbors evaluated, exiting loop ...")
                 break
-            
+
             # get neighbor list in this layer
             neighbor_list = closest_node.get_neighbors_at_layer(layer)
-            logger.debug(f"Neighbor list of closest node: {neighbor_list}")
+            if _is_debug:
+                logger.debug(f"Neighbor list of closest node: {neighbor_list}")
 
-            for neighbor in neighbor_list:
-                if neighbor not in visited_elements:
-                    visited_elements.add(neighbor)
-                    furthest_node = self._find_furthest_element(query_node, currently_found_nearest_neighbors)
-                    
-                    logger.debug(f"Neighbor: {neighbor}; furthest node: {furthest_node}")
-                    # If the distance is smaller than the furthest node we have in our list, replace it in our list
-                    n2_is_closer_n1, _, distance = query_node.n2_closer_than_n1(n2=neighbor, n1=furthest_node)
-                    if n2_is_closer_n1 or len(currently_found_nearest_neighbors) < ef:
-                        heapq.heappush(candidates, (distance*queue_factor, neighbor))
-                        currently_found_nearest_neighbors.add(neighbor)
-                        if len(currently_found_nearest_neighbors) > ef:
-                            currently_found_nearest_neighbors.remove(self._find_furthest_element(query_node, currently_found_nearest_neighbors))
-        logger.debug(f"Current nearest neighbors at L{layer}: {currently_found_nearest_neighbors}")
-        return currently_found_nearest_neighbors
+            new_neighbors = [neighbor for neighbor in neighbor_list if neighbor not in visited_elements]
+            if len(new_neighbors) == 0:
+                continue
+            visited_elements.update(new_neighbors)
+            # compute the distances to the whole unvisited neighborhood in one batch call
+            _cache_distances(new_neighbors)
+            for neighbor in new_neighbors:
+                key = cache[id(neighbor)]*queue_factor
+                # If the distance is smaller than the furthest node we have in our list, replace it in our list
+                if key > currently_found_nearest_neighbors[0][0] or len(currently_found_nearest_neighbors) < ef:
+                    heapq.heappush(candidates, (key, neighbor))
+                    heapq.heappush(currently_found_nearest_neighbors, (key, neighbor))
+                    if len(currently_found_nearest_neighbors) > ef:
+                        heapq.heappop(currently_found_nearest_neighbors) # evict the furthest
+        if _is_debug:
+            logger.debug(f"Current nearest neighbors at L{layer}: {currently_found_nearest_neighbors}")
+        return {node for _, node in currently_found_nearest_neighbors}
 
     def _search_layer_threshold(self, query_node, enter_points, threshold, n_hops, layer):
         """Performs a threshold search at a given layer of the graph.
@@ -537,8 +650,8 @@ class HNSW:
 
         return final_elements
 
-    def _select_neighbors_heuristics(self, node, candidates: set, M, 
-                                    layer, extend_candidates, keep_pruned_conns):
+    def _select_neighbors_heuristics(self, node, candidates: set, M,
+                                    layer, extend_candidates, keep_pruned_conns, distance=None):
         """Returns the M nearest neighbors to node from the list of candidates.
         This corresponds to Algorithm 4 in MY-TPAMI-20.
 
@@ -549,14 +662,18 @@ class HNSW:
         layer               -- layer number
         extend_candidates   -- flag to indicate whether or not to extend candidate list
         keep_pruned_conns   -- flag to indicate whether or not to add discarded elements
+        distance            -- memoized distance function to node (see _make_distance_fn)
         """
 
+        # hoisted guard for the f-strings built inside the selection loops
+        _is_debug = logger.isEnabledFor(logging.DEBUG)
         logger.debug(f"Selecting neighbors with a heuristic search in layer {layer} ...")
-        
+
         _r = set()
         working_candidates = candidates.copy() # makes a copy, otherwise we can get a modification in runtime
         if extend_candidates: # Neighbors of neighbors may be also my neighbors
-            logger.debug(f"Initial candidate set: {candidates}")
+            if _is_debug:
+                logger.debug(f"Initial candidate set: {candidates}")
             logger.debug("Extending candidates ...")
             for candidate in candidates:
                 neighborhood_e = candidate.get_neighbors_at_layer(layer)
@@ -564,41 +681,59 @@ class HNSW:
                     if neighbor.get_id() != node.get_id(): 
                         working_candidates.add(neighbor)
 
-        logger.debug(f"Candidates list: {candidates}")
-        
-        discarded = set()
-        while len(working_candidates) > 0 and len(_r) < M:
+        if _is_debug:
+            logger.debug(f"Candidates list: {candidates}")
+
+        if distance is None:
+            distance = node.calculate_similarity
+        queue_factor = self.get_queue_factor()
+
+        # the loop repeatedly extracts the nearest remaining candidate and
+        # compares it against the nearest element already kept in R: both are
+        # heaps keyed on -score*queue_factor, so each step is a pop/peek
+        # instead of the old O(|W|)/O(|R|) _find_nearest_element rescans
+        working_heap = [(-distance(c)*queue_factor, c) for c in working_candidates]
+        heapq.heapify(working_heap)
+        r_heap    = []
+        discarded = []
+        while len(working_heap) > 0 and len(_r) < M:
             # get nearest from W and from R and compare which is closer to new_node
-            elm_nearest_W  = self._find_nearest_element(node, working_candidates)
-            working_candidates.remove(elm_nearest_W)
+            key_W, elm_nearest_W = heapq.heappop(working_heap)
             if len(_r) == 0: # trick for first iteration
                 _r.add(elm_nearest_W)
-                logger.debug(f"Adding {elm_nearest_W} to R")
+                heapq.heappush(r_heap, (key_W, elm_nearest_W))
+                if _is_debug:
+                    logger.debug(f"Adding {elm_nearest_W} to R")
                 continue
 
-            elm_nearest_R  = self._find_nearest_element(node, _r)
-            logger.debug(f"Nearest_R vs nearest_W: {elm_nearest_R} vs {elm_nearest_W}")
-            n2_is_closer_n1, _, _ = node.n2_closer_than_n1(n1=elm_nearest_R, n2=elm_nearest_W)
-            if n2_is_closer_n1:
+            key_R, elm_nearest_R = r_heap[0]
+            if _is_debug:
+                logger.debug(f"Nearest_R vs nearest_W: {elm_nearest_R} vs {elm_nearest_W}")
+            if key_W < key_R: # elm_nearest_W is closer to node than elm_nearest_R
                 _r.add(elm_nearest_W)
-                logger.debug(f"Adding {elm_nearest_W} to R")
+                heapq.heappush(r_heap, (key_W, elm_nearest_W))
+                if _is_debug:
+                    logger.debug(f"Adding {elm_nearest_W} to R")
             else:
-                discarded.add(elm_nearest_W)
-                logger.debug(f"Adding {elm_nearest_W} to discarded set")
+                discarded.append((key_W, elm_nearest_W))
+                if _is_debug:
+                    logger.debug(f"Adding {elm_nearest_W} to discarded set")
 
         if keep_pruned_conns:
             logger.debug("Keeping pruned connections ...")
+            heapq.heapify(discarded) # appended in pop order, already a valid heap
             while len(discarded) > 0 and len(_r) < M:
-                elm = self._find_nearest_element(node, discarded)
-                discarded.remove(elm)
-                
+                _, elm = heapq.heappop(discarded) # nearest discarded element
+
                 _r.add(elm)
-                logger.debug(f"Adding {elm} to R")
+                if _is_debug:
+                    logger.debug(f"Adding {elm} to R")
 
-        logger.debug(f"Neighbors: {_r}")
+        if _is_debug:
+            logger.debug(f"Neighbors: {_r}")
         return _r
 
-    def _select_neighbors_simple(self, node, candidates: set, M):
+    def _select_neighbors_simple(self, node, candidates: set, M, distance=None):
         """Returns the M nearest neighbors to node from the list of candidates.
         This corresponds to Algorithm 3 in MY-TPAMI-20.
 
@@ -606,15 +741,19 @@ class HNSW:
         node        -- base element
         candidates  -- candidate set
         M           -- number of neighbors to return
+        distance    -- memoized distance function to node (see _make_distance_fn)
         """
-        nearest_neighbors = sorted(candidates, key=lambda obj: obj.calculate_similarity(node))
-        logger.debug(f"Neighbors to <{node}>: {nearest_neighbors}")
+        if distance is None:
+            distance = node.calculate_similarity
+        # partial selection: O(C log M) instead of sorting the whole candidate set
         if not self._distance_algorithm.is_spatial(): # similarity metric
-            return nearest_neighbors[-M:] 
+            nearest_neighbors = heapq.nlargest(M, candidates, key=distance)
         else: # distance metric
-            return nearest_neighbors[:M] 
-    
-    def _select_neighbors(self, node, candidates, M, layer): # heuristic params
+            nearest_neighbors = heapq.nsmallest(M, candidates, key=distance)
+        logger.debug(f"Neighbors to <{node}>: {nearest_neighbors}")
+        return nearest_neighbors
+
+    def _select_neighbors(self, node, candidates, M, layer, distance=None): # heuristic params
         """Returns the M nearest neighbors to node from the set of candidates.
         If not _heuristic, it uses a simple selection of neighbors (Algorithm 3 in MY-TPAMI-20).
         Otherwise, it uses a heuristic selection (Algorithm 4 in MY-TPAMI-20)
@@ -624,37 +763,45 @@ class HNSW:
         candidates  -- candidate set
         M           -- number of neighbors to return
         layer       -- layer number
+        distance    -- memoized distance function to node (see _make_distance_fn)
         """
         if not self._heuristic:
-            return self._select_neighbors_simple(node, candidates, M)
+            return self._select_neighbors_simple(node, candidates, M, distance=distance)
         else:
             return self._select_neighbors_heuristics(node, candidates, M,
                                                 layer,
-                                                self._extend_candidates, self._keep_pruned_conns)
+                                                self._extend_candidates, self._keep_pruned_conns,
+                                                distance=distance)
     
-    def _find_furthest_element(self, node, nodes):
+    def _find_furthest_element(self, node, nodes, distance=None):
         """Returns the furthest element from nodes to node.
 
         Arguments:
-        node    -- the base node
-        nodes   -- the list of candidate nodes 
+        node     -- the base node
+        nodes    -- the list of candidate nodes
+        distance -- memoized distance function to node (see _make_distance_fn)
         """
+        if distance is None:
+            distance = node.calculate_similarity
         if not self._distance_algorithm.is_spatial(): # similarity metric
-            return min((n for n in nodes), key=lambda n: node.calculate_similarity(n), default=None)
+            return min(nodes, key=distance, default=None)
         else: # distance metric
-            return max((n for n in nodes), key=lambda n: node.calculate_similarity(n), default=None)
+            return max(nodes, key=distance, default=None)
 
-    def _find_nearest_element(self, node, nodes):
+    def _find_nearest_element(self, node, nodes, distance=None):
         """Returns the nearest element from nodes to node.
 
         Arguments:
-        node    -- the base node
-        nodes   -- the list of candidate nodes 
+        node     -- the base node
+        nodes    -- the list of candidate nodes
+        distance -- memoized distance function to node (see _make_distance_fn)
         """
+        if distance is None:
+            distance = node.calculate_similarity
         if not self._distance_algorithm.is_spatial(): # similarity metric
-            return max((n for n in nodes), key=lambda n: node.calculate_similarity(n), default=None)
+            return max(nodes, key=distance, default=None)
         else: # distance metric
-            return min((n for n in nodes), key=lambda n: node.calculate_similarity(n), default=None)
+            return min(nodes, key=distance, default=None)
 
     @classmethod
     def load_cfg_from_bytes(cls, byte_data: bytearray):
@@ -745,21 +892,18 @@ class HNSW:
         """
         
         logger.info(f"Dumping to {file} (compressed? {compress}) ...")
-        if compress:
-            fp = io.BytesIO()
-        else:
-            fp = open(file, "wb")
-
         logger.debug(f"Pickling HNSW and dumping it ...")
-        pickle.dump(self, fp, protocol=pickle.DEFAULT_PROTOCOL)
-        
-        # compress output
+        # protocol 5 frames large buffers instead of chopping them into small
+        # opcodes (faster and more compact than the default protocol)
         if compress:
-            compressed_data = gz.compress(fp.getvalue())
+            # stream the pickle through gzip: the whole serialized structure
+            # is never held in memory next to its compressed copy
+            with gz.open(file, "wb") as fp:
+                pickle.dump(self, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            logger.debug(f"Compressed dump saved to {file} ... done!")
+        else:
             with open(file, "wb") as fp:
-                fp.write(compressed_data)
-            logger.debug(f"Compressing memory file and saving it to {file} ... done!")
-            fp.close()
+                pickle.dump(self, fp, protocol=pickle.HIGHEST_PROTOCOL)
 
     @classmethod
     def load(cls, file):
@@ -785,7 +929,9 @@ class HNSW:
                 obj = pickle.load(f)
         else:
             logger.debug(f"Compressed. Decompressing and desearializing ...")
-            obj = pickle.load(gz.GzipFile(file))
+            # buffer the decompressed stream: pickle issues many small reads
+            with gz.GzipFile(file) as gzf:
+                obj = pickle.load(io.BufferedReader(gzf, buffer_size=128*1024))
 
         # check everything works as expected
         if not isinstance(obj, cls):
@@ -796,31 +942,51 @@ class HNSW:
     def get_thresholdnn_at_node(self, query, threshold):
         raise NotImplementedError
 
-    def get_knn_node_at_layer(self, query, k, layer=0):
+    def get_knn_node_at_layer(self, query, k, layer=0, legacy=True):
         """Returns the K-nearest neighbors of query node (at layer) as a dict, being the key the distance score
+        (or as a flat list of (score, node) pairs sorted by score, with legacy=False)
 
         Arguments:
         query   -- base node
         k       -- number of nearest neighbor to return
         layer   -- layer level
+        legacy  -- bool to return the legacy dict of score -> list of nodes (default) instead of the flat sorted list
         """
-        
-        current_nearest_elements = query.get_neighbors_at_layer(0) 
+
+        current_nearest_elements = query.get_neighbors_at_layer(0)
         _knn_list = self._select_neighbors(query, current_nearest_elements, k, 0)
+        if not legacy:
+            return self._get_knnlist_at_node(query, _knn_list)
         _knn_dict = self._get_knndict_at_node(query, _knn_list)
         return _knn_dict
 
-    def _get_knndict_at_node(self, query, node_list: list) -> dict:
+    def _get_knnlist_at_node(self, query, node_list: list, distance=None) -> list:
+        """Returns a flat list of (similarity score, node) pairs sorted by score.
+        Consumers can iterate it in score order directly, with no key sort plus
+        per-key bucket lookup as the dict form requires.
+
+        Arguments:
+        query       -- the base node
+        node_list   -- the list of nodes to transform in list
+        distance    -- memoized distance function to query (optional, avoids rescoring)
+        """
+        if distance is None:
+            distance = query.calculate_similarity
+        result = [(distance(node), node) for node in node_list]
+        result.sort(key=lambda pair: pair[0])
+        return result
+
+    def _get_knndict_at_node(self, query, node_list: list, distance=None) -> dict:
         """Returns a dictionary of nodes where the key is the similarity score with the query node and the values are
-        the corresponding nodes.
+        the corresponding nodes (legacy result form, see _get_knnlist_at_node).
 
         Arguments:
         query       -- the base node
         node_list   -- the list of nodes to transform in dict
+        distance    -- memoized distance function to query (optional, avoids rescoring)
         """
         result = {}
-        for node in node_list:
-            value = node.calculate_similarity(query)
+        for value, node in self._get_knnlist_at_node(query, node_list, distance=distance):
             if result.get(value) is None:
                 result[value] = []
             result[value].append(node)
@@ -840,18 +1006,20 @@ class HNSW:
                 result.add(neighbor)
         return result
 
-    def aknn_search(self, query, k, ef=0): 
+    def aknn_search(self, query, k, ef=0, legacy=True):
         """Performs an approximate k-nearest neighbors search using the HNSW structure.
-        It returns a dictionary (keys are similarity score) of k nearest neighbors (the values inside the dict) to the query node.
+        It returns a dictionary (keys are similarity score) of k nearest neighbors (the values inside the dict) to the query node,
+        or a flat list of (score, node) pairs sorted by score when legacy=False.
         It raises the following exceptions:
-            * HNSWUnmatchDistanceAlgorithmError if the distance algorithm of the new node is distinct than 
+            * HNSWUnmatchDistanceAlgorithmError if the distance algorithm of the new node is distinct than
               the distance algorithm associated to the HNSW structure.
             * HNSWIsEmptyError if the HNSW structure is empty
-        
+
         Arguments:
         query   -- the node for which to find the k nearest neighbors
         k       -- the number of nearest neighbors to retrieve
         ef      -- the exploration factor (controls the search recall)
+        legacy  -- bool to return the legacy dict of score -> list of nodes (default) instead of the flat sorted list
         """
         
         self._sanity_checks(query)
@@ -861,30 +1029,39 @@ class HNSW:
             ef = self._ef
 
         logger.info(f"Performing an AKNN search of \"{query.get_id()}\" with ef={ef} ...")
-        enter_point = self._descend_to_layer(query, layer=1) 
-            
-        # and now get the nearest elements
-        current_nearest_elements = self._search_layer_knn(query, [enter_point], ef, 0)
+        enter_point = self._descend_to_layer(query, layer=1)
+
+        # and now get the nearest elements, memoizing the distances to query
+        # so the final neighbor selection does not recompute them
+        dcache   = {}
+        distance = HNSW._make_distance_fn(query, dcache)
+        current_nearest_elements = self._search_layer_knn(query, [enter_point], ef, 0, cache=dcache)
         current_nearest_elements = self._expand_with_neighbors(current_nearest_elements)
-        _knn_list = self._select_neighbors(query, current_nearest_elements, k, 0) 
-        _knn_dict = self._get_knndict_at_node(query, _knn_list)
+        _knn_list = self._select_neighbors(query, current_nearest_elements, k, 0, distance=distance)
+        if not legacy:
+            _knn_pairs = self._get_knnlist_at_node(query, _knn_list, distance=distance)
+            logger.info(f"KNNs found (AKNN search): {_knn_pairs} ...")
+            return _knn_pairs
+        _knn_dict = self._get_knndict_at_node(query, _knn_list, distance=distance)
         logger.info(f"KNNs found (AKNN search): {_knn_dict} ...")
-        
+
         # return a dictionary of nodes and similarity score
         return _knn_dict
 
-    def threshold_search(self, query, threshold, n_hops):
+    def threshold_search(self, query, threshold, n_hops, legacy=True):
         """Performs a threshold search to retrieve nodes that satisfy a certain similarity threshold using the HNSW structure.
-        It returns a list of nearest neighbor nodes to query that satisfy the specified similarity threshold.
+        It returns a list of nearest neighbor nodes to query that satisfy the specified similarity threshold
+        (as a dict keyed by similarity score, or as a flat list of (score, node) pairs sorted by score when legacy=False).
         It raises the following exceptions:
-            * HNSWUnmatchDistanceAlgorithmError if the distance algorithm of the new node is distinct than 
+            * HNSWUnmatchDistanceAlgorithmError if the distance algorithm of the new node is distinct than
               the distance algorithm associated to the HNSW structure.
             * HNSWIsEmptyError if the HNSW structure is empty
 
         Arguments:
         query      -- the query node for which to find the neighbors with a similarity above the given percentage
-        threshold  -- the similarity threshold to satisfy 
+        threshold  -- the similarity threshold to satisfy
         n_hops     -- number of hops to perform from each nearest neighbor
+        legacy     -- bool to return the legacy dict of score -> list of nodes (default) instead of the flat sorted list
         """
 
         self._sanity_checks(query)
@@ -896,6 +1073,10 @@ class HNSW:
         enter_point = self._descend_to_layer(query, layer=1)
         # get list of neighbors, considering threshold
         _current_neighs = self._search_layer_threshold(query, [enter_point], threshold, n_hops, layer=0)
+        if not legacy:
+            _knn_pairs = self._get_knnlist_at_node(query, _current_neighs)
+            logger.info(f"KNNs found (threshold search): {_knn_pairs} ...")
+            return _knn_pairs
         _knn_dict = self._get_knndict_at_node(query, _current_neighs)
         logger.info(f"KNNs found (threshold search): {_knn_dict} ...")
 
@@ -4,16 +4,54 @@ from datalayer.hash_algorithm.score_trend import ScoreTrend
 from datalayer.hash_algorithm.hash_algorithm import HashAlgorithm
 
 class HashNode(Node):
+    __slots__ = ('_hash_algorithm', '_digest_array')
+
     def __init__(self, id, hash_algorithm: HashAlgorithm):
         super().__init__(id)
         self._hash_algorithm = hash_algorithm
-    
+        self._digest_array = None # unpacked digest, cached on first use
+
     @property
     def score_trend(self):
         return self._hash_algorithm.get_score_trend()
 
     def calculate_similarity(self, other_node):
+        # score over the cached unpacked digests when the algorithm has a
+        # compiled kernel: tlsh.diff would re-parse both hex strings per call
+        array1 = self.get_digest_array()
+        if array1 is not None:
+            array2 = other_node.get_digest_array()
+            if array2 is not None:
+                return self._hash_algorithm.compare_unpacked(array1, array2)
         return self._hash_algorithm.compare(self._id, other_node._id)
+
+    def get_digest_array(self):
+        """Returns the digest of this node unpacked for the compiled batch
+        kernels (None when the algorithm has no kernel), caching it so the
+        hex digest is parsed at most once per node.
+        Computed lazily, not in __init__: DB-backed nodes get their real
+        digest assigned after construction (see create_node_from_DB).
+        """
+        # getattr: nodes restored from old pickles may miss the slot
+        array = getattr(self, '_digest_array', None)
+        if array is None:
+            array = self._digest_array = self._hash_algorithm.unpack_digest(self._id)
+        return array
+
+    def calculate_similarity_batch(self, other_nodes):
+        """Returns the similarity scores between this node and each node of
+        other_nodes, scoring the whole batch with the compiled kernel over
+        the cached unpacked digests when available.
+
+        Arguments:
+        other_nodes -- list of nodes to score against this node
+        """
+        query_array = self.get_digest_array()
+        if query_array is not None:
+            candidate_arrays = [node.get_digest_array() for node in other_nodes]
+            if not any(array is None for array in candidate_arrays):
+                return self._hash_algorithm.compare_unpacked_batch(query_array, candidate_arrays)
+        return self._hash_algorithm.compare_batch(self._id, [node._id for node in other_nodes])
     
     # checks if n2 is closer than n1 to self
     def n2_closer_than_n1(self, n1=None, n2=None):
@@ -35,7 +73,9 @@ class HashNode(Node):
         return False
     
     def to_JSON(self):
-        return json.dumps(self, default=lambda o: o.__dict__, 
+        # instances use __slots__ (no __dict__), so collect attributes from the class chain
+        return json.dumps(self, default=lambda o: {slot: getattr(o, slot)
+                for klass in type(o).__mro__ for slot in getattr(klass, '__slots__', ())},
             sort_keys=True, indent=4)
 
     def get_distance_algorithm(self):
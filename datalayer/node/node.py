@@ -3,12 +3,17 @@ from common.errors import NodeLayerError
 # HNSW Node class definition
 #TODO add docstring
 class Node:
+    # avoid a per-instance __dict__; these objects exist by the million
+    __slots__ = ('_id', '_max_layer', '_neighbors')
+
     def __init__(self, id):
         self._id = id
         self._max_layer = 0
         self._neighbors = []
 
     def set_max_layer(self, max_layer: int):
+        # not a plain setter: it also (re)allocates the per-layer neighbor sets,
+        # so do not bypass it with a direct _max_layer assignment
         self._max_layer = max_layer
         self._neighbors = [set() for _ in range(max_layer + 1)]
         
@@ -40,6 +45,9 @@ class Node:
     # only in HashNode
     def calculate_similarity(self, other_node):
         raise NotImplementedError
+    # only in HashNode (batched version of calculate_similarity)
+    def calculate_similarity_batch(self, other_nodes):
+        raise NotImplementedError
     # only in WinModuleHashNode
     def get_pageids(self):
         raise NotImplementedError
@@ -51,10 +59,29 @@ class Node:
     @classmethod
     def internal_load(cls, f):
         raise NotImplementedError
+    # final classes whose serialized record is made only of fixed-size
+    # unsigned ints may override this to enable the compiled record parser
+    @classmethod
+    def internal_serial_is_u4(cls) -> bool:
+        return False
+    # generic fallback, final classes may override it with a batched read
+    @classmethod
+    def internal_load_many(cls, f, count: int):
+        bdata_list = []
+        data_list  = []
+        for _ in range(count):
+            bdata, data = cls.internal_load(f)
+            bdata_list.append(bdata)
+            data_list.append(data)
+        return b''.join(bdata_list), data_list
     # to be implemented in final classes
     @classmethod
     def create_node_from_DB(cls, db_manager, _id, hash_algoritmh):
         raise NotImplementedError
+    # to be implemented in final classes (batched version of create_node_from_DB)
+    @classmethod
+    def create_nodes_from_DB(cls, db_manager, ids, hash_algoritmh):
+        raise NotImplementedError
     # to be implemented in final classes
     @classmethod
     def internal_data_needs_DB(cls) -> bool:
@@ -19,6 +19,8 @@ logging.getLogger('pickle').setLevel(logging.WARNING)
 
 # code adapted from https://github.com/TheAlgorithms/Python/blob/master/data_structures/trie/radix_tree.py
 class RadixHashNode:
+    # one instance per trie position: drop the per-instance __dict__
+    __slots__ = ('_nodes', '_hash_node', '_prefix')
 
     def __init__(self, prefix: str = "", hash_node: HashNode=None) -> None:
         # Mapping from the first character of the prefix of the node
@@ -1,4 +1,9 @@
 #TODO docstring
+import array
+import struct
+import sys
+from operator import attrgetter
+
 from datalayer.node.hash_node import HashNode
 from datalayer.hash_algorithm.hash_algorithm import HashAlgorithm
 from datalayer.hash_algorithm.tlsh_algorithm import TLSHHashAlgorithm
@@ -9,6 +14,8 @@ from common.constants import *
 from common.errors import NodeUnsupportedAlgorithm
 
 class WinModuleHashNode(HashNode):
+    __slots__ = ('_module', '_page')
+
     def __init__(self, id, hash_algorithm: HashAlgorithm, module: Module=None, page: Page=None):
         super().__init__(id, hash_algorithm)
         self._module = module
@@ -40,18 +47,52 @@ class WinModuleHashNode(HashNode):
         bpage_id = f.read(I_SIZE)
         return bpage_id, int.from_bytes(bpage_id, byteorder=BYTE_ORDER)
 
+    @classmethod
+    def internal_serial_is_u4(cls) -> bool:
+        return True # serialized data is just the page id (one unsigned int)
+
+    @classmethod
+    def internal_load_many(cls, f, count: int):
+        # page ids are fixed size: decode them all into a compact array.array
+        # (4 bytes per id) instead of a list of boxed Python ints
+        bpage_ids = f.read(I_SIZE*count)
+        page_ids  = array.array('I')
+        page_ids.frombytes(bpage_ids)
+        if sys.byteorder != BYTE_ORDER:
+            page_ids.byteswap()
+        return bpage_ids, page_ids
+
+    # hash getter per supported algorithm, resolved once at import time
+    # (avoids an if/elif chain on every node created while loading a file)
+    _HASH_GETTER = {
+        TLSHHashAlgorithm:   attrgetter('_page.hashTLSH'),
+        SSDEEPHashAlgorithm: attrgetter('_page.hashSSDEEP'),
+    }
+
     @classmethod
     def create_node_from_DB(cls, db_manager, _id, hash_algorithm):
-        new_node = db_manager.get_winmodule_data_by_pageid(page_id=_id, algorithm=hash_algorithm)
-        if hash_algorithm == TLSHHashAlgorithm:
-            new_node._id = new_node._page.hashTLSH
-        elif hash_algorithm == SSDEEPHashAlgorithm:
-            new_node._id = new_node._page.hashSSDEEP
-        else:
+        try:
+            get_hash = cls._HASH_GETTER[hash_algorithm]
+        except KeyError:
             raise NodeUnsupportedAlgorithm # algorithm not supported
 
+        new_node = db_manager.get_winmodule_data_by_pageid(page_id=_id, algorithm=hash_algorithm)
+        new_node._id = get_hash(new_node)
         return new_node
 
+    @classmethod
+    def create_nodes_from_DB(cls, db_manager, ids, hash_algorithm):
+        try:
+            get_hash = cls._HASH_GETTER[hash_algorithm]
+        except KeyError:
+            raise NodeUnsupportedAlgorithm # algorithm not supported
+
+        # batched version of create_node_from_DB: one query for all ids
+        new_nodes = db_manager.get_winmodules_data_by_pageids(page_ids=ids, algorithm=hash_algorithm)
+        for new_node in new_nodes.values():
+            new_node._id = get_hash(new_node)
+        return new_nodes
+
     @classmethod
     def internal_data_needs_DB(cls) -> bool:
         return True # we have some data necessary to retrieve from the DB
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Optional compiled parser for the nodes section of an Apotheosis file.
+
+Node records whose fields are all fixed-size unsigned ints (see
+WinModuleHashNode.internal_serialize) can be decoded by a Numba kernel that
+walks the section as a flat uint32 array, paying the Python interpreter cost
+once per layer instead of once per 4-byte field. When numba is not installed
+callers should keep using the regular per-record parser.
+"""
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+from common.constants import *
+from common.errors import ApotFileReadError
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    def njit(*args, **kwargs): # no-op decorator, the kernel is never called
+        def _wrap(func):
+            return func
+        return _wrap
+
+__author__ = "Daniel Huici Meseguer and Ricardo J. Rodríguez"
+__copyright__ = "Copyright 2024"
+__credits__ = ["Daniel Huici Meseguer", "Ricardo J. Rodríguez"]
+__license__ = "GPL"
+__version__ = "0.1"
+__maintainer__ = "Daniel Huici"
+__email__ = "reverseame@unizar.es"
+__status__ = "Development"
+
+@njit(cache=True)
+def _walk_nodes_section(words, n_records): # pragma: no cover (compiled)
+    """Walks n_records node records over a flat uint32 view of the nodes section.
+    Record layout (in uint32 words): <DATA> <N_HOODS> then, per neighborhood,
+    <N_LAYER> <N_NEIGHS> <NEIGH_DATA>*N_NEIGHS (see FILEFORMAT.md).
+    Returns the words consumed and flattened arrays describing every record.
+    The counts come straight from the file, so every read is bounds-checked
+    against the section extent first (njit does not check for us); if any
+    count walks past the end, the consumed-words result is -1 and the caller
+    must treat the section as corrupted.
+    """
+    data_ids     = np.empty(n_records, dtype=np.uint32)
+    hood_counts  = np.empty(n_records, dtype=np.uint32)
+    # upper bounds: there cannot be more neighborhoods/neighbors than words
+    hood_layers  = np.empty(words.shape[0], dtype=np.uint32)
+    hood_offsets = np.empty(words.shape[0] + 1, dtype=np.int64)
+    neigh_ids    = np.empty(words.shape[0], dtype=np.uint32)
+
+    size = words.shape[0]
+    pos  = 0
+    h    = 0
+    n    = 0
+    for r in range(n_records):
+        if pos + 2 > size: # truncated record header
+            return -1, data_ids, hood_counts, hood_layers[:0], hood_offsets[:1], neigh_ids[:0]
+        data_ids[r] = words[pos]
+        nhoods      = words[pos + 1]
+        pos        += 2
+        hood_counts[r] = nhoods
+        for _ in range(nhoods):
+            if pos + 2 > size: # truncated neighborhood header
+                return -1, data_ids, hood_counts, hood_layers[:0], hood_offsets[:1], neigh_ids[:0]
+            layer = words[pos]
+            count = words[pos + 1]
+            pos  += 2
+            if pos + count > size: # neighbor count walks out of the section
+                return -1, data_ids, hood_counts, hood_layers[:0], hood_offsets[:1], neigh_ids[:0]
+            hood_layers[h]  = layer
+            hood_offsets[h] = n
+            for _i in range(count):
+                neigh_ids[n] = words[pos]
+                pos += 1
+                n   += 1
+            h += 1
+    hood_offsets[h] = n
+    return pos, data_ids, hood_counts, hood_layers[:h], hood_offsets[:h + 1], neigh_ids[:n]
+
+def parse_layer_records(f, n_records: int):
+    """Parses n_records node records from an in-memory BytesIO f using the
+    compiled kernel. Returns a list of (data, {layer: [neigh_data]}) tuples
+    and the raw bytes consumed (so the caller can update its running CRC).
+    The stream position of f is advanced past the parsed records.
+    Raises ApotFileReadError if the records do not fit in the stream (as the
+    regular parser does when it runs out of bytes).
+
+    Arguments:
+    f           -- BytesIO positioned at the first record of the layer
+    n_records   -- number of node records to parse
+    """
+    buf   = f.getbuffer()
+    start = f.tell()
+    words = np.frombuffer(buf, dtype='>u4', offset=start, count=(len(buf) - start)//I_SIZE)
+    words = words.astype(np.uint32) # numba wants native byte order
+
+    consumed, data_ids, hood_counts, hood_layers, hood_offsets, neigh_ids = \
+            _walk_nodes_section(words, n_records)
+    if consumed < 0: # a file-supplied count pointed outside the section
+        del buf
+        raise ApotFileReadError(f"Node records truncated or corrupted (cannot read {n_records} records)")
+
+    records = []
+    h = 0
+    for r in range(n_records):
+        neighs_data = {}
+        for _ in range(hood_counts[r]):
+            neighs_data[int(hood_layers[h])] = \
+                    [int(nid) for nid in neigh_ids[hood_offsets[h]:hood_offsets[h + 1]]]
+            h += 1
+        records.append((int(data_ids[r]), neighs_data))
+
+    end    = start + consumed*I_SIZE
+    bchunk = bytes(buf[start:end])
+    del buf # release the memoryview so f can be used normally again
+    f.seek(end)
+    logger.debug(f"Parsed {n_records} records ({consumed} words) with the compiled kernel")
+    return records, bchunk
@@ -1,3 +1,4 @@
+import json
 import statistics
 import time
 import logging
@@ -14,6 +15,10 @@ from datalayer.node.winmodule_hash_node import WinModuleHashNode
 
 from common.errors import NodeAlreadyExistsError
 
+# line printed after each run in --serve mode, so the driver knows where
+# the output of one run ends (see tests.sensitivity_search_insert_times)
+SERVE_SENTINEL = "[=] RUN DONE"
+
 def search(pages_search, current_model, search_recall, printlog=False):
     precision = 0
     search_times = []
@@ -36,10 +41,43 @@ def main():
     parser.add_argument('-recall', '--search-recall', type=int, default=4, help="Search recall (default=4)")
     parser.add_argument('-dump', '--dump-file', type=str, help="Filename to dump Apotheosis data structure")
     parser.add_argument('-np', '--npages', type=int, default=1000, help="Number of pages to test (default=1000)")
-    parser.add_argument('-ns', '--nsearch-pages', type=int, default=0, help='Number of pages to search from outside the model (using HNSW)') 
+    parser.add_argument('-ns', '--nsearch-pages', type=int, default=0, help='Number of pages to search from outside the model (using HNSW)')
+    parser.add_argument('--serve', help="Run as a persistent worker: read one JSON line of parameter overrides from stdin per test run", action='store_true')
     args = parser.parse_args()
     # set logging level
     util.configure_logging(args.loglevel.upper())
+    if args.serve:
+        serve(args)
+        return
+    run_test(args)
+
+def serve(args):
+    """Persistent worker loop: reads newline-delimited JSON dicts of parameter
+    overrides from stdin and performs one test run per line, printing the
+    usual output plus a final SERVE_SENTINEL line. Keeping the interpreter
+    alive amortizes startup, imports and the compiled-kernel load across all
+    the runs a sweep feeds to this worker, instead of paying them per run.
+
+    Arguments:
+    args    -- parsed command-line arguments, used as defaults for every run
+    """
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        for key, value in json.loads(line).items():
+            setattr(args, key, value)
+        try:
+            run_test(args)
+        except Exception as e:
+            print(f"[-] Run failed: {e}")
+        # flush everything of this run before the sentinel, the driver
+        # reads our output up to it
+        sys.stdout.flush()
+        sys.stderr.flush()
+        print(SERVE_SENTINEL, flush=True)
+
+def run_test(args):
     algorithm = TLSHHashAlgorithm
     if args.distance_algorithm == "ssdeep":
         algorithm = SSDEEPHashAlgorithm
@@ -1,31 +1,66 @@
+import csv
+import json
 import os
-import statistics
+import re
 import sys
-from subprocess import Popen, PIPE
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import Popen, PIPE, STDOUT
 import common.utilities as util
+from tests.search_insert_times_test import SERVE_SENTINEL
+
+# compiled once: picks the line type and the time of the relevant
+# "[+] INSERT/SEARCH ...: <time> ms" lines in one pass over the raw bytes
+TIME_RE = re.compile(rb'^\[\+\] (INSERT|SEARCH EXACT|SEARCH AKNN)[^:]*:\s*([0-9eE.+-]+)\s*ms', re.MULTILINE)
+# quoted hash value of the "already exists" log lines
+HASH_RE = re.compile(r'"([^"]+)"')
+
+# one persistent --serve worker per pool thread: interpreter startup,
+# imports and the compiled-kernel load are paid once per worker instead
+# of once per grid point
+_worker_local = threading.local()
+_workers      = []
+_workers_lock = threading.Lock()
+_SENTINEL     = SERVE_SENTINEL.encode("utf-8")
+
+def _get_worker():
+    process = getattr(_worker_local, 'process', None)
+    if process is None or process.poll() is not None:
+        # stderr is merged into stdout: one pipe to drain, no deadlock
+        # risk, and the consumer tells the line types apart anyway
+        process = Popen([sys.executable, "-m", "tests.search_insert_times_test", "--serve"],\
+                        stdin=PIPE, stdout=PIPE, stderr=STDOUT)
+        _worker_local.process = process
+        with _workers_lock:
+            _workers.append(process)
+    return process
+
+def _shutdown_workers():
+    with _workers_lock:
+        for process in _workers:
+            process.stdin.close()
+            process.wait()
+        _workers.clear()
 
 def run_search_insert_test(M: int=4, ef: int=4, Mmax: int=16,\
                             Mmax0: int=16, algorithm="", bf: float=0.0,\
                             search_recall: int=4, dump_filename: str=None,\
                             npages: int=200, nsearch_pages: int=0):
-    cmd = ["python3", "-m", "tests.search_insert_times_test"]
-
-    cmd.extend(["--M", str(M)]);
-    cmd.extend(["--ef", str(ef)]);
-    cmd.extend(["--Mmax", str(Mmax)]);
-    cmd.extend(["--Mmax0",  str(Mmax0)]);
-    cmd.extend(["-algorithm",  str(algorithm)]);
-    if bf > 0:
-        cmd.extend(["--beer-factor", str(bf)]);
-    cmd.extend(["--search-recall", str(search_recall)]);
-    if dump_filename:
-        cmd.extend(["--dump-file", str(dump_filename)]);
-    cmd.extend(["--npages", str(npages)]);
-    cmd.extend(["--nsearch-pages", str(nsearch_pages)]);
+    params = {"M": M, "ef": ef, "Mmax": Mmax, "Mmax0": Mmax0,\
+                "distance_algorithm": str(algorithm), "beer_factor": bf,\
+                "search_recall": search_recall, "dump_file": dump_filename,\
+                "npages": npages, "nsearch_pages": nsearch_pages}
 
-    process = Popen(cmd, stdout=PIPE, stderr=PIPE)
-    stdout, stderr = process.communicate()
-    return stdout, stderr
+    process = _get_worker()
+    process.stdin.write((json.dumps(params) + "\n").encode("utf-8"))
+    process.stdin.flush()
+    # collect this run's output (stdout and stderr, merged) up to the sentinel
+    output = []
+    for line in process.stdout:
+        if line.startswith(_SENTINEL):
+            break
+        output.append(line)
+    return b''.join(output)
 
 if __name__ == '__main__':
     parser  = util.configure_argparse()
@@ -66,59 +101,72 @@ if __name__ == '__main__':
         Mmax0   = range(16, 16*(args.factor + 1), 4)
     
     
+    # warm the on-disk numba cache once, serially, before fanning out: the
+    # kernels compile eagerly on import (explicit signatures, cache=True),
+    # so after this every subprocess loads the compiled kernels from the
+    # cache instead of paying the JIT warmup — without it, the whole first
+    # wave of children would each recompile the same kernels
+    try:
+        import datalayer.hash_algorithm.tlsh_numba # noqa: F401
+    except ImportError:
+        pass # no numba (or numpy): the children will use tlsh.diff anyway
+
     equal_hashes = set()
 
-    f = open(os.path.join(args.output_log_directory, filename), "w")
-    f.write(f'TYPE,EF,M,MMAX,MMAX0,TIME\n')
+    # large write buffer: rows are tiny, keep them off the syscall path;
+    # csv.writer formats each row in C instead of one f-string per row
+    f = open(os.path.join(args.output_log_directory, filename), "w", newline='', buffering=1<<20)
+    writer = csv.writer(f)
+    writer.writerow(('TYPE', 'EF', 'M', 'MMAX', 'MMAX0', 'TIME'))
    
+    # the sweep is embarrassingly parallel across configurations: run every
+    # grid point through a pool and consume the results afterwards in the
+    # same deterministic order as the old serial loops. Threads are enough as
+    # workers, each one just feeds its persistent --serve child process (one
+    # CPU-bound python3 each) and blocks reading its output
+    executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+    futures  = {}
     for ef in EF:
         for m in M:
             for mmax in Mmax:
-                insert_list     = []
-                search_exact    = []
-                search_approx   = []
                 for mmax0 in Mmax0:
-                    stdout, stderr = run_search_insert_test(m, ef, mmax, mmax0,\
+                    futures[(ef, m, mmax, mmax0)] = executor.submit(run_search_insert_test,\
+                            m, ef, mmax, mmax0,\
                             args.distance_algorithm, args.beer_factor,\
                             args.search_recall, args.dump_file, npages=args.npages, nsearch_pages=args.nsearch_pages)
-                    # get search and insert times
-                    stdout_lines = [s.decode("utf-8") for s in stdout.splitlines()]
-                    for line in stdout_lines:
-                        if "SEARCH" not in line:
-                            if "INSERT" not in line:
-                                continue
-                            else:
-                                insert_time = float(line.split(':')[1].replace('ms', ''))
-                                
-                                f.write(f'I,{ef},{m},{mmax},{mmax0},{insert_time}\n')
-                                insert_list.append(insert_time)
-                        else:
-                            search_time = float(line.split(':')[1].replace('ms', ''))
-                            if "SEARCH EXACT" in line:
-                                search_method = "SE"
-                                search_exact.append(search_time)
-                            else:
-                                search_method = "SA"
-                                search_approx.append(search_time)
-                            f.write(f'{search_method},{ef},{m},{mmax},{mmax0},{search_time}\n')
-                # get equal hashes
-                stderr_lines = [s.decode("utf-8") for s in stderr.splitlines()]
-                for line in stderr_lines:
-                    try:
+
+    for ef in EF:
+        for m in M:
+            for mmax in Mmax:
+                for mmax0 in Mmax0:
+                    output = futures[(ef, m, mmax, mmax0)].result()
+                    # get search and insert times: one regex pass over the raw
+                    # output, no intermediate list of decoded lines
+                    for match in TIME_RE.finditer(output):
+                        line_type = match.group(1)
+                        line_time = float(match.group(2))
+                        if line_type == b'INSERT':
+                            writer.writerow(('I', ef, m, mmax, mmax0, line_time))
+                        elif line_type == b'SEARCH EXACT':
+                            writer.writerow(('SE', ef, m, mmax, mmax0, line_time))
+                        else: # SEARCH AKNN
+                            writer.writerow(('SA', ef, m, mmax, mmax0, line_time))
+                    # get equal hashes: the worker merges its log stream
+                    # (stderr) into the output, pick the relevant lines
+                    for line in output.decode("utf-8").splitlines():
                         if "COLLISION" in line:
                             print(f"Collision found: {line}")
-                        else:
-                            line  = line.split("\"")
-                            _hash = line[1]
-                            equal_hashes.add(_hash)
-                    except Exception as e:
-                        print(f"Exception occurred with line {line}")
-                        print(e)
+                        elif "already exists" in line:
+                            match = HASH_RE.search(line)
+                            if match:
+                                equal_hashes.add(match.group(1))
+    executor.shutdown()
+    _shutdown_workers()
     f.close()
     
-    f = open(f"equal_hashes_{args.factor}_{args.npages}.out", "w")
-    for equal_hash in equal_hashes:
-        f.write(equal_hash)
-        f.write("\n")
-    f.close()
+    # one buffered write instead of two small writes per hash
+    with open(f"equal_hashes_{args.factor}_{args.npages}.out", "w") as f:
+        if equal_hashes:
+            f.write("\n".join(equal_hashes))
+            f.write("\n")
     print("[+] Done!")                    